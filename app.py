@@ -1,11 +1,28 @@
-import json
+import orjson
 import random
+import math
+import time
+import tempfile
+import hashlib
+import functools
+import asyncio
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
 import numpy as np
 import logging
-from sklearn.metrics.pairwise import cosine_similarity
 import os
 
+try:
+    import faiss  # optional: ANN index for large intent libraries
+except ImportError:
+    faiss = None
+
+try:
+    from numba import njit, prange  # optional: fused similarity + argmax kernel
+except ImportError:
+    njit = None
+
 # Logger setup
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -14,6 +31,154 @@ logging.basicConfig(level=logging.INFO)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")  # <- now expects Gemini key
 API_URL = "https://generativelanguage.googleapis.com/v1beta/models"
 MODEL_NAME = os.getenv("MODEL_NAME", "gemini-1.5-flash")  # default Gemini model
+EMBEDDING_MODEL = "text-embedding-004"
+EMBEDDING_DIM = 768  # text-embedding-004 output size, used for empty/fallback vectors
+EMBEDDING_BATCH_SIZE = 64  # stay well under the provider's per-request limit
+EMBEDDING_CONCURRENCY = 16  # max in-flight requests for async callers
+HNSW_MIN_PATTERNS = 5000  # below this an exact flat index is fast enough
+LOCAL_MATCH_THRESHOLD = 0.95  # shingle overlap needed to skip the embedding call
+MAX_API_ATTEMPTS = 4  # total tries per API call on 429/5xx
+MAX_RETRY_WAIT = 30.0  # cap on any single backoff, in seconds
+EMBEDDINGS_CACHE_FILE = os.getenv("EMBEDDINGS_CACHE_FILE", "embeddings_cache.json")
+PATTERN_MATRIX_FILE = os.getenv("PATTERN_MATRIX_FILE", "pattern_matrix.npy")
+PATTERN_TAGS_FILE = os.getenv("PATTERN_TAGS_FILE", "pattern_tags.json")  # manifest for the matrix
+
+# Request constants, built once instead of per call
+_EMBED_URL = f"{API_URL}/{EMBEDDING_MODEL}:embedText?key={GEMINI_API_KEY}"
+_BATCH_EMBED_URL = f"{API_URL}/{EMBEDDING_MODEL}:batchEmbedContents?key={GEMINI_API_KEY}"
+_GEMINI_GEN_URL = f"{API_URL}/{MODEL_NAME}:generateContent?key={GEMINI_API_KEY}"
+_GEMINI_STREAM_URL = f"{API_URL}/{MODEL_NAME}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
+_SYSTEM_PROMPT = (
+    "You are CDSC Club’s highly knowledgeable and friendly chatbot. "
+    "Always reply helpfully, in natural conversational language, "
+    "adding context, examples, and clarity. "
+    "If user input is slightly ambiguous, infer the most likely intent and respond correctly. "
+    "Avoid robotic, vague, or repetitive answers. "
+    "Provide detailed, accurate, and user-friendly guidance."
+)
+# Fixed prompt segments around the per-request fields, joined once per call
+_PROMPT_HEAD = _SYSTEM_PROMPT + "\n\nUser message: "
+_PROMPT_TAIL = "\n\nCraft a detailed, helpful, friendly, and context-aware response."
+
+# Shared pooled session so repeated API calls reuse TCP/TLS connections
+SESSION = requests.Session()
+SESSION.headers.update({"Content-Type": "application/json"})
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=32))
+
+
+def _char_ngrams(text, n=3):
+    """Character n-grams of text; strings shorter than n yield themselves."""
+    return frozenset(text[i:i + n] for i in range(max(len(text) - n + 1, 1)))
+
+
+def _retry_delay(status, retry_after, attempt):
+    """Seconds to wait before retrying a response, or None if it should not be retried.
+
+    429s honour Retry-After when it is a non-negative number of seconds; 5xx (and
+    unusable Retry-After values) use exponential backoff. Other statuses (including 4xx)
+    are returned to the caller as-is.
+    """
+    if status == 429:
+        try:
+            wait = float(retry_after)
+        except (TypeError, ValueError):
+            wait = -1.0
+        if not math.isfinite(wait) or wait < 0:
+            wait = 2 ** attempt
+    elif status >= 500:
+        wait = 2 ** attempt
+    else:
+        return None
+    return min(wait, MAX_RETRY_WAIT) + random.uniform(0, 0.25)
+
+
+def _do_with_retry(fn, max_attempts=MAX_API_ATTEMPTS):
+    """Call fn() (which returns a requests.Response), retrying rate limits and server errors."""
+    for attempt in range(max_attempts):
+        response = fn()
+        delay = _retry_delay(response.status_code, response.headers.get("Retry-After"), attempt)
+        if delay is None or attempt == max_attempts - 1:
+            return response
+        response.close()
+        logger.warning(f"API returned {response.status_code}, retrying in {delay:.2f}s ({attempt + 1}/{max_attempts})")
+        time.sleep(delay)
+
+
+async def _apost_json_with_retry(session, url, payload, timeout=None, max_attempts=MAX_API_ATTEMPTS):
+    """POST with aiohttp and decode the JSON body, retrying rate limits and server errors.
+
+    timeout=None keeps the session's own timeout; aiohttp would read an explicit None
+    as "no timeout at all".
+    """
+    post_kwargs = {} if timeout is None else {"timeout": timeout}
+    for attempt in range(max_attempts):
+        async with session.post(url, json=payload, **post_kwargs) as response:
+            delay = _retry_delay(response.status, response.headers.get("Retry-After"), attempt)
+            if delay is None or attempt == max_attempts - 1:
+                return await response.json(loads=orjson.loads)
+        logger.warning(f"API returned {response.status}, retrying in {delay:.2f}s ({attempt + 1}/{max_attempts})")
+        await asyncio.sleep(delay)
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _best_match(q, M):
+        """Return (row, score) of the row of M with the largest dot product with q.
+
+        Rows are split into contiguous blocks scanned in parallel, each keeping its own
+        running best, so no similarity array is materialized and threads never share state.
+        """
+        n, d = M.shape
+        n_blocks = min(n, 64)
+        block = (n + n_blocks - 1) // n_blocks
+        block_s = np.full(n_blocks, -np.inf, dtype=np.float32)
+        block_i = np.zeros(n_blocks, dtype=np.int64)
+        for b in prange(n_blocks):
+            for i in range(b * block, min(n, (b + 1) * block)):
+                s = np.float32(0.0)
+                for j in range(d):
+                    s += q[j] * M[i, j]
+                if s > block_s[b]:
+                    block_s[b] = s
+                    block_i[b] = i
+        k = np.argmax(block_s)
+        return block_i[k], block_s[k]
+else:
+    _best_match = None
+
+
+def _atomic_write(path, write):
+    """Write path via a unique temp file in the same directory, then os.replace it into place.
+
+    Unique names keep concurrently starting workers from clobbering each other's temp file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            write(file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _orjson_dumps_str(obj):
+    """orjson-backed serializer for aiohttp, which expects str rather than bytes."""
+    return orjson.dumps(obj).decode()
+
+
+@functools.lru_cache(maxsize=1024)
+def _fetch_embedding(text):
+    """Fetch one embedding; failures raise, so only successful lookups are memoized."""
+    payload = {"model": EMBEDDING_MODEL, "text": text}
+    response = _do_with_retry(lambda: SESSION.post(_EMBED_URL, data=orjson.dumps(payload), timeout=15))
+    data = orjson.loads(response.content)
+    embedding = np.asarray(data["embedding"]["values"], dtype=np.float32)
+    embedding.setflags(write=False)  # the memoized array is shared by every caller
+    return embedding
 
 
 class CDSCChatbot:
@@ -22,19 +187,45 @@ class CDSCChatbot:
         logger.info("Initializing CDSC Enhanced Chatbot...")
         self.intents = self.load_intents(intents_file)
         self.intent_text_cache = self._flatten_patterns()
-        self.embeddings_cache = {}
+        self._aio_session = None
+        self._aio_semaphore = None
+        self._aio_loop = None
+        self._intent_by_tag = {}
+        for intent in self.intents:  # first intent wins on duplicate tags, as the old linear scans did
+            if "tag" in intent:
+                self._intent_by_tag.setdefault(intent["tag"], intent)
+        self._fallback_intent = self._intent_by_tag.get("fallback")
+        self.pattern_rows, self.pattern_texts, self.pattern_tags = self._index_patterns()
+        self.pattern_matrix_norm = self._load_pattern_matrix(intents_file)
+        if self.pattern_matrix_norm is None:
+            self.pattern_matrix_norm = self._normalize_rows(self._build_pattern_matrix())
+            self._save_pattern_matrix(intents_file, self.pattern_matrix_norm)
+        self.pattern_index = self._build_pattern_index(self.pattern_matrix_norm)
+        # Rows for training examples added at runtime; kept apart so the (possibly shared,
+        # memory-mapped) pattern matrix is never copied, and searched alongside it
+        self._runtime_matrix = np.zeros((0, self.pattern_matrix_norm.shape[1]), dtype=np.float32)
+        self._exact, self._shingles = {}, []
+        for pattern, tag in zip(self.pattern_texts, self.pattern_tags):
+            self._add_local_pattern(pattern, tag)
         logger.info(f"Loaded {len(self.intents)} intents successfully.")
 
     # -------------------- INTENT LOADING --------------------
     def load_intents(self, filename):
         try:
-            with open(filename, 'r') as file:
-                data = json.load(file)
-                return data.get('intents', [])
+            with open(filename, 'rb') as file:
+                data = orjson.loads(file.read())
+                intents = data.get('intents', [])
         except Exception as e:
             logger.error(f"Error loading intents: {e}")
             return []
 
+        # Precompute per-intent response views used on every reply
+        for intent in intents:
+            responses = intent.get("responses", [])
+            intent["_style_examples"] = ", ".join(responses)
+            intent["_responses_tuple"] = tuple(responses)
+        return intents
+
     def _flatten_patterns(self):
         """Flatten all intent patterns for semantic search."""
         intent_map = {}
@@ -43,80 +234,433 @@ class CDSCChatbot:
                 intent_map[intent["tag"]] = intent["patterns"]
         return intent_map
 
+    def _index_patterns(self):
+        """Assign each distinct pattern one embedding row.
+
+        Returns (pattern -> row, row texts, row tags). A pattern listed under several
+        tags shares a row and resolves to the first tag that declared it.
+        """
+        rows, texts, tags = {}, [], []
+        for tag, patterns in self.intent_text_cache.items():
+            for pattern in patterns:
+                if pattern not in rows:
+                    rows[pattern] = len(texts)
+                    texts.append(pattern)
+                    tags.append(tag)
+        return rows, texts, tags
+
+    def _build_pattern_matrix(self):
+        """Embed every pattern up front, reusing the disk cache and batching only the misses."""
+        patterns = self.pattern_texts
+        if not patterns:
+            return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+
+        disk_cache = self._load_embeddings_cache()
+        keys = [self._embedding_key(p) for p in patterns]
+        misses = [p for p, k in zip(patterns, keys) if k not in disk_cache]
+        failed = {}
+        if misses:
+            logger.info(f"Embedding {len(misses)} uncached patterns...")
+            fetched = self.get_embeddings_batch(misses)
+            for pattern, emb in zip(misses, fetched):
+                if np.any(emb):  # never persist zero-vector fallbacks
+                    disk_cache[self._embedding_key(pattern)] = emb.tolist()
+                else:
+                    failed[pattern] = emb
+            self._save_embeddings_cache(disk_cache)
+
+        matrix = np.empty((len(patterns), EMBEDDING_DIM), dtype=np.float32)
+        for i, (pattern, key) in enumerate(zip(patterns, keys)):
+            matrix[i] = disk_cache[key] if key in disk_cache else failed[pattern]
+        return matrix
+
+    @staticmethod
+    def _embedding_key(text):
+        return hashlib.sha256(f"{EMBEDDING_MODEL}\n{text}".encode("utf-8")).hexdigest()
+
+    def _load_embeddings_cache(self):
+        try:
+            with open(EMBEDDINGS_CACHE_FILE, 'rb') as file:
+                return orjson.loads(file.read())
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable embeddings cache: {e}")
+            return {}
+
+    def _save_embeddings_cache(self, cache):
+        try:
+            _atomic_write(EMBEDDINGS_CACHE_FILE, lambda file: file.write(orjson.dumps(cache)))
+        except Exception as e:
+            logger.warning(f"Could not write embeddings cache: {e}")
+
+    @staticmethod
+    def _intents_digest(intents_file):
+        with open(intents_file, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    def _load_pattern_matrix(self, intents_file):
+        """Memory-map the persisted normalized matrix if it was built from this exact intents file.
+
+        The mapping is read-only and backed by the OS page cache, so worker processes share
+        one physical copy. Returns None when the files are missing or stale.
+        """
+        try:
+            with open(PATTERN_TAGS_FILE, 'rb') as file:
+                manifest = orjson.loads(file.read())
+            if (manifest.get("intents_sha256") != self._intents_digest(intents_file)
+                    or manifest.get("embedding_model") != EMBEDDING_MODEL
+                    or manifest.get("pattern_texts") != self.pattern_texts
+                    or manifest.get("pattern_tags") != self.pattern_tags):
+                return None
+            matrix = np.load(PATTERN_MATRIX_FILE, mmap_mode='r')
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable pattern matrix: {e}")
+            return None
+
+        if matrix.shape[0] != len(self.pattern_texts):
+            return None
+        logger.info(f"Memory-mapped {matrix.shape[0]} pattern embeddings from {PATTERN_MATRIX_FILE}.")
+        return matrix
+
+    def _save_pattern_matrix(self, intents_file, matrix):
+        """Persist the normalized matrix and its manifest, unless some rows failed to embed."""
+        if not len(matrix) or not np.all(np.any(matrix, axis=1)):
+            return
+        try:
+            manifest = {
+                "intents_sha256": self._intents_digest(intents_file),
+                "embedding_model": EMBEDDING_MODEL,
+                "pattern_texts": self.pattern_texts,
+                "pattern_tags": self.pattern_tags,
+            }
+            if os.path.exists(PATTERN_TAGS_FILE):
+                os.remove(PATTERN_TAGS_FILE)  # never leave a manifest describing a half-written matrix
+            _atomic_write(PATTERN_MATRIX_FILE, lambda file: np.save(file, np.asarray(matrix, dtype=np.float32)))
+            _atomic_write(PATTERN_TAGS_FILE, lambda file: file.write(orjson.dumps(manifest)))
+        except Exception as e:
+            logger.warning(f"Could not write pattern matrix: {e}")
+
+    @staticmethod
+    def _normalize_rows(matrix):
+        """L2-normalize each row so cosine similarity reduces to a dot product.
+
+        The result is float32: half the bytes of float64 per similarity sweep,
+        while still going through BLAS (float16/int8 matmul has no BLAS path in numpy).
+        """
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).astype(np.float32, copy=False)
+
+    @staticmethod
+    def _build_pattern_index(matrix):
+        """Build a FAISS inner-product index over the normalized patterns, if faiss is installed.
+
+        FAISS copies the vectors into its own storage, so a memory-mapped matrix below the
+        HNSW threshold is searched in place instead, keeping it shared across workers.
+        """
+        if faiss is None or not len(matrix):
+            return None
+        if isinstance(matrix, np.memmap) and len(matrix) < HNSW_MIN_PATTERNS:
+            return None
+        dim = matrix.shape[1]
+        if len(matrix) >= HNSW_MIN_PATTERNS:
+            index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efSearch = 64
+        else:
+            index = faiss.IndexFlatIP(dim)
+        index.add(np.ascontiguousarray(matrix, dtype=np.float32))
+        return index
+
     # -------------------- EMBEDDING / SEMANTIC MATCH --------------------
     def get_embedding(self, text):
         """Fetch embedding vector from Gemini Embeddings API."""
         try:
-            url = f"https://generativelanguage.googleapis.com/v1beta/models/text-embedding-004:embedText?key={GEMINI_API_KEY}"
-            payload = {"model": "text-embedding-004", "text": text}
-            response = requests.post(url, json=payload, timeout=15)
-            data = response.json()
-            return np.array(data["embedding"]["values"])
+            return _fetch_embedding(text)
         except Exception as e:
             logger.warning(f"Embedding fetch failed: {e}")
-            return np.zeros(768)  # fallback zero vector
+            return np.zeros(EMBEDDING_DIM, dtype=np.float32)  # fallback zero vector
+
+    def get_embeddings_batch(self, texts):
+        """Fetch embeddings for many texts via batchEmbedContents, returned as an (N, D) array.
+
+        Texts are sorted by length before chunking so each sub-batch holds similarly
+        sized inputs (less server-side padding); rows come back in the original order.
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sorted_texts = [texts[i] for i in order]
+        chunks = [sorted_texts[i:i + EMBEDDING_BATCH_SIZE] for i in range(0, len(texts), EMBEDDING_BATCH_SIZE)]
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            results = asyncio.run(self._embed_chunks(chunks))
+        else:
+            # Built from inside an event loop (e.g. an async app): asyncio.run would raise,
+            # so send the chunks one after another over the pooled sync session instead.
+            results = [self._embed_chunk_sync(c) for c in chunks]
+
+        rows = []
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Batch embedding failed, falling back to single requests: {result}")
+                rows.extend(self.get_embedding(t) for t in chunk)
+            else:
+                rows.extend(result)
+
+        out = np.empty((len(texts), len(rows[0]) if rows else EMBEDDING_DIM), dtype=np.float32)
+        for position, row in zip(order, rows):
+            out[position, :] = row
+        return out
+
+    @staticmethod
+    def _batch_payload(chunk):
+        return {"requests": [
+            {"model": f"models/{EMBEDDING_MODEL}", "content": {"parts": [{"text": t}]}}
+            for t in chunk
+        ]}
+
+    @staticmethod
+    def _chunk_rows(data, chunk):
+        """Return a batch response's embedding rows, failing unless there is exactly one per text."""
+        embeddings = data["embeddings"]
+        if len(embeddings) != len(chunk):
+            raise ValueError(f"batch returned {len(embeddings)} embeddings for {len(chunk)} texts")
+        return [e["values"] for e in embeddings]
+
+    def _embed_chunk_sync(self, chunk):
+        """Embed one chunk over SESSION; returns its rows, or the exception on failure."""
+        try:
+            response = _do_with_retry(
+                lambda: SESSION.post(_BATCH_EMBED_URL, data=orjson.dumps(self._batch_payload(chunk)), timeout=30)
+            )
+            return self._chunk_rows(orjson.loads(response.content), chunk)
+        except Exception as e:
+            return e
+
+    async def _embed_chunks(self, chunks):
+        """Embed all chunks concurrently; a failed chunk yields its exception instead of rows.
+
+        Rows are returned as raw value lists and copied straight into the caller's float32 buffer.
+        """
+        semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+
+        async def embed_chunk(session, chunk):
+            async with semaphore:
+                data = await _apost_json_with_retry(
+                    session, _BATCH_EMBED_URL, self._batch_payload(chunk), timeout=aiohttp.ClientTimeout(total=30)
+                )
+            return self._chunk_rows(data, chunk)
+
+        async with aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=30), json_serialize=_orjson_dumps_str
+        ) as session:
+            return await asyncio.gather(*(embed_chunk(session, c) for c in chunks), return_exceptions=True)
+
+    # -------------------- ASYNC API --------------------
+    async def _get_aio_session(self):
+        """Lazily open the shared aiohttp session on the caller's event loop.
+
+        The session and semaphore are bound to the loop that created them, so both are
+        replaced (and the old session closed) when called from a different loop, e.g.
+        successive asyncio.run calls.
+        """
+        loop = asyncio.get_running_loop()
+        if self._aio_session is None or self._aio_session.closed or self._aio_loop is not loop:
+            await self._release_aio_session()
+            self._aio_session = aiohttp.ClientSession(json_serialize=_orjson_dumps_str)
+            self._aio_semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+            self._aio_loop = loop
+        return self._aio_session
+
+    async def _release_aio_session(self):
+        """Close and forget the shared session, on its own loop if that loop is still alive."""
+        session, owner = self._aio_session, self._aio_loop
+        self._aio_session = self._aio_loop = None
+        if session is None or session.closed:
+            return
+        if owner is None or owner.is_closed() or owner is asyncio.get_running_loop():
+            try:
+                await session.close()
+            except Exception as e:
+                logger.warning(f"Could not close aiohttp session: {e}")
+        else:
+            asyncio.run_coroutine_threadsafe(session.close(), owner)
+
+    async def aclose(self):
+        """Close the shared aiohttp session opened by the async methods."""
+        await self._release_aio_session()
+
+    async def aget_embedding(self, text):
+        """Async variant of get_embedding for callers running an event loop."""
+        payload = {"model": EMBEDDING_MODEL, "text": text}
+        try:
+            session = await self._get_aio_session()
+            async with self._aio_semaphore:
+                data = await _apost_json_with_retry(
+                    session, _EMBED_URL, payload, timeout=aiohttp.ClientTimeout(total=15)
+                )
+            return np.asarray(data["embedding"]["values"], dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Embedding fetch failed: {e}")
+            return np.zeros(EMBEDDING_DIM, dtype=np.float32)  # fallback zero vector
+
+    async def agenerate_detailed_response(self, user_message, intent_tag):
+        """Async variant of generate_detailed_response."""
+        intent, payload = self._generation_request(user_message, intent_tag)
+        try:
+            session = await self._get_aio_session()
+            async with self._aio_semaphore:
+                data = await _apost_json_with_retry(
+                    session, _GEMINI_GEN_URL, payload, timeout=aiohttp.ClientTimeout(total=20)
+                )
+            return self._extract_reply(data, intent)
+        except Exception as e:
+            logger.error(f"Response generation failed: {e}")
+            return "Sorry, something went wrong while generating a detailed reply."
 
     def find_best_intent(self, user_message):
         """Find the closest intent tag based on embedding similarity."""
-        user_emb = self.get_embedding(user_message)
-        best_tag, best_score = None, -1
+        local = self._local_match(user_message)
+        if local:
+            return local
+        return self._match_embedding(self.get_embedding(user_message))
 
-        for tag, patterns in self.intent_text_cache.items():
-            for pattern in patterns:
-                if pattern not in self.embeddings_cache:
-                    self.embeddings_cache[pattern] = self.get_embedding(pattern)
-                sim = cosine_similarity([user_emb], [self.embeddings_cache[pattern]])[0][0]
-                if sim > best_score:
-                    best_score, best_tag = sim, tag
-
-        if best_tag:
-            logger.info(f"Best semantic match found: {best_tag} (score: {best_score:.3f})")
+    def _local_match(self, user_message):
+        """Match near-verbatim pattern text without an API call; returns (tag, score) or None."""
+        key = user_message.lower().strip()
+        tag = self._exact.get(key)
+        if tag:
+            logger.info(f"Exact pattern match found: {tag}")
+            return tag, 1.0
+
+        grams = _char_ngrams(key)
+        best_tag, best_score = None, 0.0
+        for pattern_grams, tag in self._shingles:
+            score = len(grams & pattern_grams) / len(grams | pattern_grams)
+            if score > best_score:
+                best_tag, best_score = tag, score
+        if best_score > LOCAL_MATCH_THRESHOLD:
+            logger.info(f"Local shingle match found: {best_tag} (score: {best_score:.3f})")
             return best_tag, best_score
-        return "fallback", 0.0
+        return None
+
+    def _match_embedding(self, user_emb):
+        """Return the (tag, score) of the pattern closest to an already-fetched embedding."""
+        if not self.pattern_tags:
+            return "fallback", 0.0
+
+        # A failed fetch yields the zero vector; don't let it (or NaNs) reach the similarity sweep
+        norm = np.linalg.norm(user_emb)
+        if not np.isfinite(norm) or norm < 1e-8:
+            logger.warning("Query embedding unavailable or degenerate; using fallback intent.")
+            return "fallback", 0.0
+
+        query = (user_emb / norm).astype(np.float32)
+        if not len(self.pattern_matrix_norm):
+            idx, best_score = -1, -np.inf
+        elif self.pattern_index is not None:
+            scores, ids = self.pattern_index.search(query[None, :], 1)
+            idx, best_score = int(ids[0, 0]), float(scores[0, 0])
+        elif _best_match is not None:
+            idx, best_score = _best_match(query, self.pattern_matrix_norm)
+            idx, best_score = int(idx), float(best_score)
+        else:
+            sims = self.pattern_matrix_norm @ query
+            idx = int(np.argmax(sims))
+            best_score = float(sims[idx])
+
+        if len(self._runtime_matrix):
+            runtime_sims = self._runtime_matrix @ query
+            j = int(np.argmax(runtime_sims))
+            if runtime_sims[j] > best_score:
+                idx, best_score = len(self.pattern_matrix_norm) + j, float(runtime_sims[j])
+        best_tag = self.pattern_tags[idx]
+
+        logger.info(f"Best semantic match found: {best_tag} (score: {best_score:.3f})")
+        return best_tag, best_score
 
     # -------------------- RESPONSE GENERATION --------------------
-    def generate_detailed_response(self, user_message, intent_tag):
-        """Produce a detailed, human-like reply using Gemini API."""
-        intent = next((i for i in self.intents if i.get("tag") == intent_tag), None)
-        style_examples = ", ".join(intent.get("responses", [])) if intent else ""
-
-        system_prompt = (
-            "You are CDSC Club’s highly knowledgeable and friendly chatbot. "
-            "Always reply helpfully, in natural conversational language, "
-            "adding context, examples, and clarity. "
-            "If user input is slightly ambiguous, infer the most likely intent and respond correctly. "
-            "Avoid robotic, vague, or repetitive answers. "
-            "Provide detailed, accurate, and user-friendly guidance."
-        )
+    def _generation_request(self, user_message, intent_tag):
+        """Build the generateContent payload for a detailed reply."""
+        intent = self._intent_by_tag.get(intent_tag)
+        style_examples = intent.get("_style_examples", "") if intent else ""
+
+        prompt = "".join((
+            _PROMPT_HEAD, user_message,
+            "\nIdentified intent: ", intent_tag,
+            "\nExample responses: ", style_examples,
+            _PROMPT_TAIL,
+        ))
+
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        return intent, payload
 
-        prompt = (
-            f"User message: {user_message}\n"
-            f"Identified intent: {intent_tag}\n"
-            f"Example responses: {style_examples}\n\n"
-            "Craft a detailed, helpful, friendly, and context-aware response."
+    @staticmethod
+    def _extract_text(data):
+        """Return the text of the first candidate in a generateContent response (or stream chunk)."""
+        return (
+            data.get("candidates", [{}])[0]
+            .get("content", {})
+            .get("parts", [{}])[0]
+            .get("text", "")
         )
 
-        try:
-            url = f"{API_URL}/{MODEL_NAME}:generateContent?key={GEMINI_API_KEY}"
-            payload = {"contents": [{"parts": [{"text": system_prompt + "\n\n" + prompt}]}]}
-            response = requests.post(url, json=payload, timeout=20)
-            data = response.json()
+    def _extract_reply(self, data, intent):
+        """Pull the reply text out of a generateContent response, falling back to a canned answer."""
+        reply = self._extract_text(data).strip()
+        if not reply:
+            reply = self._canned_reply(intent)
+        return reply
 
-            reply = (
-                data.get("candidates", [{}])[0]
-                .get("content", {})
-                .get("parts", [{}])[0]
-                .get("text", "")
-                .strip()
-            )
+    @staticmethod
+    def _canned_reply(intent):
+        return random.choice(intent.get("_responses_tuple", ())) if intent else "I'm here to help!"
 
-            if not reply:
-                reply = random.choice(intent.get("responses", [])) if intent else "I'm here to help!"
-            return reply
+    def generate_detailed_response(self, user_message, intent_tag):
+        """Produce a detailed, human-like reply using Gemini API."""
+        intent, payload = self._generation_request(user_message, intent_tag)
+        try:
+            response = _do_with_retry(
+                lambda: SESSION.post(_GEMINI_GEN_URL, data=orjson.dumps(payload), timeout=20)
+            )
+            return self._extract_reply(orjson.loads(response.content), intent)
         except Exception as e:
             logger.error(f"Response generation failed: {e}")
             return "Sorry, something went wrong while generating a detailed reply."
 
+    def stream_detailed_response(self, user_message, intent_tag):
+        """Yield the reply as text deltas from streamGenerateContent as they arrive.
+
+        Closing the generator early (e.g. on client disconnect) closes the upstream stream.
+        """
+        intent, payload = self._generation_request(user_message, intent_tag)
+        parts = []
+        try:
+            response = _do_with_retry(
+                lambda: SESSION.post(_GEMINI_STREAM_URL, data=orjson.dumps(payload), timeout=20, stream=True)
+            )
+            with response:
+                for line in response.iter_lines():
+                    if not line.startswith(b"data:"):
+                        continue
+                    delta = self._extract_text(orjson.loads(line[5:]))
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+        except Exception as e:
+            logger.error(f"Streaming response generation failed: {e}")
+            if not parts:
+                yield "Sorry, something went wrong while generating a detailed reply."
+            return
+
+        reply = "".join(parts)
+        if not reply.strip():
+            yield self._canned_reply(intent)
+        else:
+            logger.info(f"Streamed reply for {intent_tag} ({len(reply)} chars)")
+
     # -------------------- MAIN SEMANTIC PIPELINE --------------------
     def api_semantic_match(self, user_message):
         """Full pipeline: find intent, generate detailed response, fallback if needed."""
@@ -132,21 +676,84 @@ class CDSCChatbot:
             logger.error(f"Semantic pipeline failed: {e}")
             return self.get_fallback_intent()
 
+    def api_semantic_match_stream(self, user_message):
+        """Streaming variant of api_semantic_match; "response" is an iterator of text chunks."""
+        try:
+            tag, score = self.find_best_intent(user_message)
+        except Exception as e:
+            logger.error(f"Semantic pipeline failed: {e}")
+            tag, score = "fallback", 0.0
+
+        if score < 0.6:  # confidence threshold
+            result = self.get_fallback_intent()
+            return {**result, "response": iter((result["response"],))}
+        return {"tag": tag, "confidence": float(score), "response": self.stream_detailed_response(user_message, tag)}
+
+    async def aapi_semantic_match(self, user_message):
+        """Async variant of api_semantic_match."""
+        try:
+            tag, score = self._local_match(user_message) or self._match_embedding(
+                await self.aget_embedding(user_message)
+            )
+            if score < 0.6:  # confidence threshold
+                return self.get_fallback_intent()
+
+            detailed_reply = await self.agenerate_detailed_response(user_message, tag)
+            return {"tag": tag, "confidence": float(score), "response": detailed_reply}
+
+        except Exception as e:
+            logger.error(f"Semantic pipeline failed: {e}")
+            return self.get_fallback_intent()
+
     # -------------------- FALLBACK --------------------
     def get_fallback_intent(self):
         """Default fallback response if no intent matches."""
-        fallback = next((i for i in self.intents if i.get("tag") == "fallback"), None)
+        fallback = self._fallback_intent
         return {
             "tag": "fallback",
             "confidence": 0.0,
-            "response": random.choice(fallback.get("responses", ["I'm not sure I understand yet."])) if fallback else "I'm not sure I understand yet."
+            "response": random.choice(fallback.get("_responses_tuple") or ("I'm not sure I understand yet.",)) if fallback else "I'm not sure I understand yet."
         }
 
     # -------------------- TRAINING EXAMPLES --------------------
     def add_training_example(self, user_message, correct_intent):
-        """Record new user message as training pattern."""
-        for intent in self.intents:
-            if intent.get("tag") == correct_intent:
-                intent.setdefault("patterns", []).append(user_message)
-                logger.info(f"Added training example: '{user_message}' -> {correct_intent}")
-                break
+        """Record new user message as training pattern, matchable from the next query on.
+
+        Like the patterns themselves, training examples live in memory only and are
+        gone after a restart unless added to the intents file.
+        """
+        intent = self._intent_by_tag.get(correct_intent)
+        if intent is None:
+            return
+        self._attach_pattern(user_message, correct_intent)
+        self._add_local_pattern(user_message, correct_intent)
+        if user_message not in self.pattern_rows:
+            self._embed_training_example(user_message, correct_intent)
+        logger.info(f"Added training example: '{user_message}' -> {correct_intent}")
+
+    def _attach_pattern(self, text, tag):
+        """Append text to the tag's intent patterns (shared with intent_text_cache)."""
+        intent = self._intent_by_tag[tag]
+        self.intent_text_cache.setdefault(tag, intent.setdefault("patterns", [])).append(text)
+
+    def _append_pattern_row(self, text, tag):
+        self.pattern_rows[text] = len(self.pattern_texts)
+        self.pattern_texts.append(text)
+        self.pattern_tags.append(tag)
+
+    def _add_local_pattern(self, text, tag):
+        """Register text with the exact-match and shingle fast paths; the first tag wins."""
+        key = text.lower().strip()
+        if key not in self._exact:
+            self._exact[key] = tag
+            self._shingles.append((_char_ngrams(key), tag))
+
+    def _embed_training_example(self, text, tag):
+        """Embed text into the runtime rows searched alongside the pattern matrix."""
+        emb = self.get_embedding(text)
+        if not np.any(emb):
+            logger.warning(f"Could not embed training example '{text}'; only local matching will see it.")
+            return
+
+        self._append_pattern_row(text, tag)
+        self._runtime_matrix = np.vstack((self._runtime_matrix, self._normalize_rows(emb[None, :])))
@@ -0,0 +1,261 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import sys
+import time
+
+import aiohttp
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+
+INTENTS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "intents.json")
+
+
+def fake_embedding(text):
+    """Deterministic pseudo-embedding so restarts see the same vectors without the network."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(app.EMBEDDING_DIM).astype(np.float32)
+
+
+@pytest.fixture
+def make_bot(tmp_path, monkeypatch):
+    """Build chatbots in an isolated directory with the embedding API stubbed out."""
+    shutil.copy(INTENTS_FILE, tmp_path / "intents.json")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(app.CDSCChatbot, "get_embedding", lambda self, text: fake_embedding(text))
+    monkeypatch.setattr(
+        app.CDSCChatbot, "get_embeddings_batch", lambda self, texts: np.vstack([fake_embedding(t) for t in texts])
+    )
+    return lambda: app.CDSCChatbot("intents.json")
+
+
+def test_training_example_is_matched_on_next_query(make_bot):
+    bot = make_bot()
+    phrase = "zzqq unique phrase"
+
+    bot.add_training_example(phrase, "greeting")
+
+    assert bot.find_best_intent(phrase) == ("greeting", 1.0)
+    tag, score = bot._match_embedding(bot.get_embedding(phrase))
+    assert tag == "greeting"
+    assert score == pytest.approx(1.0, abs=1e-5)
+
+
+def test_training_keeps_the_shared_matrix_mapped_and_untouched(make_bot):
+    make_bot()  # first start builds and persists the pattern matrix
+    bot = make_bot()
+    mapped = bot.pattern_matrix_norm
+    mtimes = [os.path.getmtime(f) for f in (app.PATTERN_MATRIX_FILE, app.PATTERN_TAGS_FILE)]
+
+    bot.add_training_example("zzqq unique phrase", "greeting")
+    bot.add_training_example("another fresh example", "fallback")
+
+    assert bot.pattern_matrix_norm is mapped and isinstance(mapped, np.memmap)
+    assert bot._runtime_matrix.shape == (2, app.EMBEDDING_DIM)
+    assert bot._match_embedding(bot.get_embedding("another fresh example"))[0] == "fallback"
+    assert [os.path.getmtime(f) for f in (app.PATTERN_MATRIX_FILE, app.PATTERN_TAGS_FILE)] == mtimes
+
+
+def test_training_examples_are_in_memory_only(make_bot):
+    phrase = "zzqq unique phrase"
+    make_bot().add_training_example(phrase, "greeting")
+
+    bot = make_bot()
+
+    assert isinstance(bot.pattern_matrix_norm, np.memmap)
+    assert phrase not in bot.pattern_rows
+    assert phrase not in bot.intent_text_cache["greeting"]
+
+
+class FakeResponse:
+    """Stand-in for a requests.Response / aiohttp response with a JSON body."""
+
+    def __init__(self, status, body=None, headers=None):
+        self.status_code = self.status = status
+        self.headers = headers or {}
+        self.body = body if body is not None else {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    async def json(self, loads=None):
+        return self.body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeAioSession:
+    """Records aiohttp-style post() calls and replays canned responses in order."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def post(self, url, **kwargs):
+        self.calls.append(kwargs)
+        return self.responses.pop(0)
+
+
+@pytest.mark.parametrize("retry_after", ["-1", "nan", "inf", "soon", None])
+def test_retry_delay_falls_back_to_backoff_for_unusable_retry_after(retry_after):
+    delay = app._retry_delay(429, retry_after, 2)
+    assert 4 <= delay <= 4.25
+
+
+def test_retry_delay_honours_retry_after_and_skips_client_errors():
+    assert 3 <= app._retry_delay(429, "3", 0) <= 3.25
+    assert app._retry_delay(429, "9999", 0) <= app.MAX_RETRY_WAIT + 0.25
+    assert app._retry_delay(404, None, 0) is None
+
+
+def test_do_with_retry_retries_rate_limits_and_server_errors(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(app.time, "sleep", sleeps.append)
+    responses = [FakeResponse(429, headers={"Retry-After": "1"}), FakeResponse(503), FakeResponse(200)]
+
+    response = app._do_with_retry(lambda: responses.pop(0))
+
+    assert response.status_code == 200
+    assert len(sleeps) == 2
+    assert 1 <= sleeps[0] <= 1.25 and 2 <= sleeps[1] <= 2.25
+
+
+def test_do_with_retry_returns_client_errors_and_last_attempt(monkeypatch):
+    monkeypatch.setattr(app.time, "sleep", lambda delay: None)
+    assert app._do_with_retry(lambda: FakeResponse(400)).status_code == 400
+
+    calls = []
+    last = app._do_with_retry(lambda: calls.append(1) or FakeResponse(500), max_attempts=3)
+    assert last.status_code == 500 and len(calls) == 3
+
+
+def test_apost_json_with_retry_retries_and_only_passes_explicit_timeouts():
+    session = FakeAioSession([FakeResponse(429, headers={"Retry-After": "0"}), FakeResponse(200, {"ok": True})])
+    assert asyncio.run(app._apost_json_with_retry(session, "http://x", {})) == {"ok": True}
+    assert all("timeout" not in call for call in session.calls)
+
+    session = FakeAioSession([FakeResponse(200, {"ok": True})])
+    timeout = aiohttp.ClientTimeout(total=5)
+    asyncio.run(app._apost_json_with_retry(session, "http://x", {}, timeout=timeout))
+    assert session.calls[0]["timeout"] is timeout
+
+
+def test_apost_json_with_retry_keeps_the_session_timeout():
+    async def main():
+        writers = []  # accept connections but never answer
+        server = await asyncio.start_server(lambda reader, writer: writers.append(writer), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=0.5)) as session:
+                await asyncio.wait_for(
+                    app._apost_json_with_retry(session, f"http://127.0.0.1:{port}/", {}), timeout=5
+                )
+        finally:
+            for writer in writers:
+                writer.close()
+            server.close()
+            await server.wait_closed()
+
+    started = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(main())
+    assert time.monotonic() - started < 3  # the session's 0.5s, not the 5s guard
+
+
+def batch_bot(monkeypatch, short_texts=()):
+    """A bare chatbot whose batchEmbedContents calls hit a fake aiohttp session.
+
+    Responses embed each text with fake_embedding; chunks containing any of short_texts
+    come back one embedding short. Returns the bot and the list of posted chunks.
+    """
+    posted = []
+
+    class FakeBatchSession(FakeAioSession):
+        def __init__(self, **kwargs):
+            super().__init__([])
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        def post(self, url, json=None, **kwargs):
+            texts = [r["content"]["parts"][0]["text"] for r in json["requests"]]
+            posted.append(texts)
+            embeddings = [{"values": fake_embedding(t).tolist()} for t in texts]
+            if any(t in short_texts for t in texts):
+                embeddings.pop()
+            return FakeResponse(200, {"embeddings": embeddings})
+
+    monkeypatch.setattr(app.aiohttp, "ClientSession", FakeBatchSession)
+    monkeypatch.setattr(app.CDSCChatbot, "get_embedding", lambda self, text: fake_embedding(text))
+    return app.CDSCChatbot.__new__(app.CDSCChatbot), posted
+
+
+def test_get_embeddings_batch_falls_back_per_text_on_short_responses(monkeypatch):
+    monkeypatch.setattr(app, "EMBEDDING_BATCH_SIZE", 2)
+    bot, posted = batch_bot(monkeypatch, short_texts={"ccc"})
+    texts = ["a", "bb", "ccc", "dddd"]
+
+    out = bot.get_embeddings_batch(texts)
+
+    assert len(posted) == 2
+    for text, row in zip(texts, out):
+        np.testing.assert_allclose(row, fake_embedding(text))
+
+
+def test_get_embeddings_batch_sorts_by_length_and_restores_order(monkeypatch):
+    monkeypatch.setattr(app, "EMBEDDING_BATCH_SIZE", 2)
+    bot, posted = batch_bot(monkeypatch)
+    texts = ["a much longer pattern", "hi", "medium text", "yo", "hey"]
+
+    out = bot.get_embeddings_batch(texts)
+
+    assert posted == [["hi", "yo"], ["hey", "medium text"], ["a much longer pattern"]]
+    assert out.shape == (len(texts), app.EMBEDDING_DIM) and out.dtype == np.float32
+    for text, row in zip(texts, out):
+        np.testing.assert_allclose(row, fake_embedding(text))
+
+
+def test_local_match_exact_is_case_and_whitespace_insensitive(make_bot, monkeypatch):
+    bot = make_bot()
+    monkeypatch.setattr(app.CDSCChatbot, "get_embedding", lambda self, text: pytest.fail("embedding requested"))
+
+    assert bot._local_match("  HELLO ") == ("greeting", 1.0)
+    assert bot.find_best_intent("hello") == ("greeting", 1.0)
+
+
+def test_local_match_shingles_accept_near_verbatim_and_reject_the_rest():
+    bot = app.CDSCChatbot.__new__(app.CDSCChatbot)
+    bot._exact, bot._shingles = {}, []
+    pattern = "how do i register my team for the upcoming vibeathon hackathon event this weekend"
+    bot._add_local_pattern(pattern, "events")
+
+    tag, score = bot._local_match(pattern + "?")
+    assert tag == "events" and app.LOCAL_MATCH_THRESHOLD < score < 1.0
+    assert bot._local_match("how do i register my team") is None
+    assert bot._local_match("") is None
+
+
+def test_aio_session_is_closed_when_replaced_or_released():
+    bot = app.CDSCChatbot.__new__(app.CDSCChatbot)
+    bot._aio_session = bot._aio_semaphore = bot._aio_loop = None
+
+    first = asyncio.run(bot._get_aio_session())
+    second = asyncio.run(bot._get_aio_session())
+
+    assert first is not second
+    assert first.closed and not second.closed
+
+    asyncio.run(bot.aclose())
+    assert second.closed and bot._aio_session is None